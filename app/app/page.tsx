@@ -19,6 +19,7 @@ export default function Home() {
   const [selectedEmail, setSelectedEmail] = useState<Email | null>(null);
   const [actionItems, setActionItems] = useState<ActionItem[]>([]);
   const [chatMessages, setChatMessages] = useState<ChatMessage[]>([]);
+  const [chatSessionId, setChatSessionId] = useState<string | undefined>(undefined);
   const [prompts, setPrompts] = useState<PromptConfig | null>(null);
   const [searchQuery, setSearchQuery] = useState('');
 
@@ -42,6 +43,8 @@ export default function Home() {
   const [isSidebarCollapsed, setIsSidebarCollapsed] = useState(false);
 
   const fileInputRef = useRef<HTMLInputElement>(null);
+  // Last change-feed cursor reflected in `emails`
+  const changeCursorRef = useRef<string | undefined>(undefined);
 
   // Load initial data
   useEffect(() => {
@@ -64,7 +67,10 @@ export default function Home() {
   const loadEmails = async () => {
     try {
       setIsLoadingEmails(true);
+      // Take the cursor before fetching so no change is missed
+      const { cursor } = await api.fetchChanges();
       const fetchedEmails = await api.fetchEmails();
+      changeCursorRef.current = cursor;
       setEmails(fetchedEmails);
 
       // Auto-categorize if not already categorized
@@ -88,13 +94,27 @@ export default function Home() {
     }
   };
 
+  // Merge only the emails that changed since the last sync
+  const syncEmailChanges = async () => {
+    const changes = await api.fetchChanges(changeCursorRef.current);
+    if (changes.reset) {
+      changeCursorRef.current = changes.cursor;
+      setEmails(await api.fetchEmails());
+      return;
+    }
+    changeCursorRef.current = changes.cursor;
+    if (changes.emails.length === 0) return;
+
+    const changedById = new Map(changes.emails.map(e => [e.id, e]));
+    setEmails(prev => prev.map(e => changedById.get(e.id) ?? e));
+  };
+
   const categorizeAllEmails = async () => {
     try {
       setIsCategorizing(true);
-      const result = await api.categorizeAllEmails();
-      // Reload emails to get updated categories
-      const updatedEmails = await api.fetchEmails();
-      setEmails(updatedEmails);
+      await api.categorizeAllEmails();
+      // Pick up the updated categories
+      await syncEmailChanges();
     } catch (error) {
       console.error('Failed to categorize emails:', error);
     } finally {
@@ -282,7 +302,12 @@ export default function Home() {
     setIsChatLoading(true);
 
     try {
-      const response = await api.chatWithAgent(message, chatMessages, emails);
+      let sessionId = chatSessionId;
+      if (!sessionId) {
+        sessionId = (await api.createChatSession()).session_id;
+        setChatSessionId(sessionId);
+      }
+      const response = await api.chatWithAgent(message, sessionId);
 
       const assistantMessage: ChatMessage = {
         role: 'assistant',
@@ -294,6 +319,10 @@ export default function Home() {
       setChatMessages(prev => [...prev, assistantMessage]);
     } catch (error) {
       console.error('Failed to chat:', error);
+      // The server dropped the session (e.g. after a restart); start a new one next time
+      if (error instanceof api.ApiError && error.status === 404) {
+        setChatSessionId(undefined);
+      }
       const errorMessage: ChatMessage = {
         role: 'assistant',
         content: 'Sorry, I encountered an error. Please try again.',
@@ -424,6 +453,7 @@ export default function Home() {
             prompts={prompts}
             onSave={handlePromptSave}
             onReset={handlePromptReset}
+            onEvaluate={api.evaluatePrompt}
           />
         </div>
       );
@@ -1,21 +1,42 @@
 "use client";
 
 import { useState, useEffect } from 'react';
-import { PromptConfig } from '@/lib/types';
+import { PromptConfig, PromptEvaluationReport, PromptVariantReport } from '@/lib/types';
 import { Save, RotateCcw, Loader2 } from 'lucide-react';
 
+// Prompts that run on a single email can be tried on sample emails before saving
+const EVALUATED_PROMPTS: (keyof PromptConfig)[] = ['categorization', 'action_extraction', 'reply_generation'];
+
 interface PromptEditorProps {
     prompts: PromptConfig;
     onSave: (promptType: string, promptText: string) => Promise<void>;
     onReset: () => Promise<void>;
+    onEvaluate?: (promptType: string, promptText: string) => Promise<PromptEvaluationReport>;
 }
 
-export default function PromptEditor({ prompts, onSave, onReset }: PromptEditorProps) {
+const formatPercent = (value: number) => `${Math.round(value * 100)}%`;
+
+const formatVariant = (report: PromptVariantReport) => [
+    `${formatPercent(report.parse_failure_rate)} parse failures`,
+    report.avg_latency_ms !== undefined && report.avg_latency_ms !== null
+        ? `${report.avg_latency_ms} ms avg`
+        : 'cached',
+    `~${report.estimated_tokens} tokens`,
+    ...(report.label_accuracy !== undefined && report.label_accuracy !== null
+        ? [`${formatPercent(report.label_accuracy)} label accuracy`]
+        : []),
+].join(' · ');
+
+export default function PromptEditor({ prompts, onSave, onReset, onEvaluate }: PromptEditorProps) {
     const [activeTab, setActiveTab] = useState<keyof PromptConfig>('categorization');
     const [editedPrompts, setEditedPrompts] = useState<PromptConfig>(prompts);
     const [isSaving, setIsSaving] = useState(false);
     const [isResetting, setIsResetting] = useState(false);
     const [saveMessage, setSaveMessage] = useState('');
+    const [isEvaluating, setIsEvaluating] = useState(false);
+    // Evaluation of the current edit; saving requires confirming it first
+    const [evaluation, setEvaluation] = useState<PromptEvaluationReport | null>(null);
+    const [evaluatedText, setEvaluatedText] = useState('');
 
     useEffect(() => {
         setEditedPrompts(prompts);
@@ -29,11 +50,36 @@ export default function PromptEditor({ prompts, onSave, onReset }: PromptEditorP
         { id: 'chat_system', label: 'Chat System', description: 'Conversational agent behavior' },
     ];
 
+    const needsEvaluation = !!onEvaluate
+        && EVALUATED_PROMPTS.includes(activeTab)
+        && (evaluation === null || evaluatedText !== editedPrompts[activeTab]);
+
+    const handleEvaluate = async () => {
+        if (!onEvaluate) return;
+        setIsEvaluating(true);
+        setSaveMessage('');
+        try {
+            const promptText = editedPrompts[activeTab];
+            setEvaluation(await onEvaluate(activeTab, promptText));
+            setEvaluatedText(promptText);
+        } catch (error) {
+            setEvaluation(null);
+            setSaveMessage(error instanceof Error ? error.message : 'Evaluation failed');
+        } finally {
+            setIsEvaluating(false);
+        }
+    };
+
     const handleSave = async () => {
+        if (needsEvaluation) {
+            await handleEvaluate();
+            return;
+        }
         setIsSaving(true);
         setSaveMessage('');
         try {
             await onSave(activeTab, editedPrompts[activeTab]);
+            setEvaluation(null);
             setSaveMessage('Saved successfully!');
             setTimeout(() => setSaveMessage(''), 3000);
         } catch (error) {
@@ -98,7 +144,10 @@ export default function PromptEditor({ prompts, onSave, onReset }: PromptEditorP
                 {tabs.map((tab) => (
                     <button
                         key={tab.id}
-                        onClick={() => setActiveTab(tab.id)}
+                        onClick={() => {
+                            setActiveTab(tab.id);
+                            setEvaluation(null);
+                        }}
                         className={`prompt-tab ${activeTab === tab.id ? 'active' : ''}`}
                     >
                         <span className="tab-label">{tab.label}</span>
@@ -125,17 +174,17 @@ export default function PromptEditor({ prompts, onSave, onReset }: PromptEditorP
                         <button
                             onClick={handleSave}
                             className="btn btn-primary"
-                            disabled={isSaving || !hasChanges}
+                            disabled={isSaving || isEvaluating || !hasChanges}
                         >
-                            {isSaving ? (
+                            {isSaving || isEvaluating ? (
                                 <>
                                     <Loader2 size={16} className="spin" />
-                                    Saving...
+                                    {isEvaluating ? 'Evaluating...' : 'Saving...'}
                                 </>
                             ) : (
                                 <>
                                     <Save size={16} />
-                                    Save Prompt
+                                    {needsEvaluation ? 'Evaluate & Save' : evaluation ? 'Confirm Save' : 'Save Prompt'}
                                 </>
                             )}
                         </button>
@@ -146,6 +195,16 @@ export default function PromptEditor({ prompts, onSave, onReset }: PromptEditorP
                         )}
                     </div>
 
+                    {evaluation && evaluatedText === editedPrompts[activeTab] && (
+                        <div className="evaluation-report">
+                            <p className="help-title">
+                                Tested on {evaluation.sample_size} emails · {formatPercent(evaluation.agreement)} agreement with the current prompt
+                            </p>
+                            <p className="evaluation-line">Current: {formatVariant(evaluation.baseline)}</p>
+                            <p className="evaluation-line">Edited: {formatVariant(evaluation.candidate)}</p>
+                        </div>
+                    )}
+
                     <div className="prompt-help">
                         <p className="help-title">Available Variables:</p>
                         <div className="help-vars">
@@ -313,6 +372,18 @@ export default function PromptEditor({ prompts, onSave, onReset }: PromptEditorP
           color: var(--category-urgent);
         }
 
+        .evaluation-report {
+          padding: 1rem;
+          background: var(--bg-secondary);
+          border: 1px solid var(--border-default);
+          border-radius: 8px;
+        }
+
+        .evaluation-line {
+          color: var(--text-muted);
+          font-size: 0.875rem;
+        }
+
         .prompt-help {
           padding: 1rem;
           background: rgba(59, 130, 246, 0.05);
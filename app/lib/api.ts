@@ -1,7 +1,13 @@
-import { Email, ActionItem, ChatMessage, ChatResponse, PromptConfig, DraftReply } from './types';
+import { Email, ActionItem, ChatResponse, PromptConfig, DraftReply, ChangeSet, PromptEvaluationReport } from './types';
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
+export class ApiError extends Error {
+    constructor(public status: number, message: string) {
+        super(message);
+    }
+}
+
 // Helper function for API calls
 async function apiCall<T>(endpoint: string, options?: RequestInit): Promise<T> {
     const response = await fetch(`${API_BASE_URL}${endpoint}`, {
@@ -14,7 +20,7 @@ async function apiCall<T>(endpoint: string, options?: RequestInit): Promise<T> {
 
     if (!response.ok) {
         const error = await response.text();
-        throw new Error(`API Error: ${response.status} - ${error}`);
+        throw new ApiError(response.status, `API Error: ${response.status} - ${error}`);
     }
 
     return response.json();
@@ -47,6 +53,12 @@ export async function uploadEmailsFile(file: File): Promise<{ success: boolean;
     return response.json();
 }
 
+// Change feed
+export async function fetchChanges(since?: string): Promise<ChangeSet> {
+    const url = since !== undefined ? `/api/changes?since=${encodeURIComponent(since)}` : '/api/changes';
+    return apiCall<ChangeSet>(url);
+}
+
 // LLM-powered endpoints
 export async function categorizeEmail(email: Email): Promise<{ email_id: string; category: string }> {
     return apiCall('/api/categorize', {
@@ -99,19 +111,27 @@ export async function summarizeEmails(emails: Email[], focus?: string): Promise<
 
 export async function chatWithAgent(
     message: string,
-    conversationHistory: ChatMessage[],
-    emailContext?: Email[]
+    sessionId?: string,
+    emailIds?: string[]
 ): Promise<ChatResponse> {
+    // History lives on the server; only the session ID and email IDs are sent
     return apiCall<ChatResponse>('/api/chat', {
         method: 'POST',
         body: JSON.stringify({
             message,
-            conversation_history: conversationHistory,
-            email_context: emailContext,
+            session_id: sessionId,
+            email_ids: emailIds,
         }),
     });
 }
 
+export async function createChatSession(emailIds?: string[]): Promise<{ session_id: string }> {
+    return apiCall('/api/chat/sessions', {
+        method: 'POST',
+        body: JSON.stringify({ email_ids: emailIds }),
+    });
+}
+
 // Prompt management endpoints
 export async function fetchPrompts(): Promise<PromptConfig> {
     return apiCall<PromptConfig>('/api/prompts');
@@ -127,6 +147,18 @@ export async function updatePrompt(
     });
 }
 
+export async function evaluatePrompt(
+    promptType: string,
+    promptText: string,
+    sampleSize: number = 10,
+    labels?: Record<string, string>
+): Promise<PromptEvaluationReport> {
+    return apiCall<PromptEvaluationReport>('/api/prompts/evaluate', {
+        method: 'POST',
+        body: JSON.stringify({ prompt_type: promptType, prompt_text: promptText, sample_size: sampleSize, labels }),
+    });
+}
+
 export async function resetPrompts(): Promise<{ success: boolean; message: string }> {
     return apiCall('/api/prompts/reset', {
         method: 'POST',
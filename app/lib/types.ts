@@ -55,10 +55,19 @@ export interface ChatMessage {
 
 export interface ChatResponse {
     message: string;
+    session_id?: string;
     referenced_emails?: string[];
     suggested_actions?: string[];
 }
 
+export interface ChangeSet {
+    cursor: string;
+    version: number;
+    reset: boolean;
+    emails: Email[];
+    action_items: ActionItem[];
+}
+
 export interface PromptConfig {
     categorization: string;
     action_extraction: string;
@@ -67,4 +76,29 @@ export interface PromptConfig {
     chat_system: string;
 }
 
+export interface PromptVariantReport {
+    parse_failure_rate: number;
+    fresh_calls: number;
+    avg_latency_ms?: number;
+    max_latency_ms?: number;
+    estimated_tokens: number;
+    cache_hits: number;
+    label_accuracy?: number;
+}
+
+export interface PromptEvaluationReport {
+    prompt_type: string;
+    sample_size: number;
+    agreement: number;
+    baseline: PromptVariantReport;
+    candidate: PromptVariantReport;
+    cases: {
+        email_id: string;
+        baseline_output: string;
+        candidate_output: string;
+        agreement: number;
+        label?: string;
+    }[];
+}
+
 export type ViewType = "inbox" | "action-items" | "drafts" | "chat" | "settings";
@@ -1,6 +1,13 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+import time
+
+# Captured before the heavier imports below so cold start is measured from here
+PROCESS_START = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict, Any
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional
+import asyncio
 import json
 from pathlib import Path
 from dotenv import load_dotenv
@@ -9,11 +16,16 @@ import os
 from models.schemas import (
     Email, EmailCategory, ActionItem, ChatMessage, ChatRequest, ChatResponse,
     PromptConfig, PromptUpdate, CategorizeRequest, ExtractActionsRequest,
-    GenerateReplyRequest, SummarizeRequest
+    GenerateReplyRequest, SummarizeRequest, ChatSessionCreate, ChatSessionInfo,
+    ChangeSet, PromptEvaluationRequest, PromptEvaluationReport
 )
-from services.llm_service import get_llm_service
+from services.llm_service import get_llm_service, peek_llm_service
+from services.chat_session_service import get_session_store
+from services.email_matcher import get_email_matcher
+from services.change_feed import get_change_feed, EMAIL, ACTION_ITEM
+from services.prompt_evaluation_service import evaluate_prompt
 from services.prompt_service import (
-    load_prompts, save_prompts, update_prompt, reset_prompts, DEFAULT_PROMPTS
+    load_prompts, save_prompts, update_prompt, reset_prompts, validate_prompt, DEFAULT_PROMPTS
 )
 
 # Load environment variables
@@ -40,11 +52,30 @@ app.add_middleware(
 MOCK_EMAILS_FILE = Path(__file__).parent / "data" / "mock_emails.json"
 emails_db: List[Email] = []
 action_items_db: List[ActionItem] = []
+# ID lookups kept in step with the lists above (records are updated in place)
+email_index: Dict[str, Email] = {}
+action_item_index: Dict[str, ActionItem] = {}
+
+# Startup state
+emails_load_task: Optional[asyncio.Task] = None
+llm_warmup_task: Optional[asyncio.Task] = None
+LLM_WARMUP = os.getenv("LLM_WARMUP", "0") == "1"
+startup_metrics: Dict[str, Any] = {
+    "app_ready_ms": None,       # process start -> accepting requests
+    "emails_loaded_ms": None,   # process start -> email corpus loaded
+    "first_request_ms": None,   # latency of the first API request
+    "first_request_path": None
+}
+
+
+def elapsed_since_start() -> float:
+    """Milliseconds since the process started."""
+    return round((time.perf_counter() - PROCESS_START) * 1000, 1)
 
 
 def load_mock_emails():
     """Load mock emails from JSON file."""
-    global emails_db
+    global emails_db, email_index
     try:
         with open(MOCK_EMAILS_FILE, 'r', encoding='utf-8') as f:
             data = json.load(f)
@@ -52,23 +83,75 @@ def load_mock_emails():
     except Exception as e:
         print(f"Error loading mock emails: {e}")
         emails_db = []
+    email_index = {e.id: e for e in emails_db}
+    get_email_matcher().reset(emails_db)
+    startup_metrics["emails_loaded_ms"] = elapsed_since_start()
+    print(f"Loaded {len(emails_db)} mock emails")
+
+
+def warm_up_llm():
+    """Create the LLM client and load the model ahead of the first request."""
+    get_llm_service().warm_up()
+
+
+async def load_llm_service():
+    """Get the LLM service without blocking the event loop while it is created.
+    
+    Creating it imports the LLM backend, which can take a while (and may
+    already be under way in the warm-up thread).
+    """
+    llm = peek_llm_service()
+    if llm is None:
+        llm = await asyncio.to_thread(get_llm_service)
+    return llm
+
 
+async def wait_for_emails():
+    """Wait for the background email load to finish."""
+    if emails_load_task and not emails_load_task.done():
+        await asyncio.shield(emails_load_task)
 
-# Load emails on startup
+
+# Load emails in the background so the server answers /health immediately
 @app.on_event("startup")
 async def startup_event():
-    load_mock_emails()
-    print(f"Loaded {len(emails_db)} mock emails")
+    global emails_load_task, llm_warmup_task
+    emails_load_task = asyncio.create_task(asyncio.to_thread(load_mock_emails))
+    if LLM_WARMUP:
+        llm_warmup_task = asyncio.create_task(asyncio.to_thread(warm_up_llm))
+    startup_metrics["app_ready_ms"] = elapsed_since_start()
+
+
+@app.middleware("http")
+async def record_first_request(request: Request, call_next):
+    """Record the latency of the first API request after startup."""
+    started = time.perf_counter()
+    response = await call_next(request)
+    if startup_metrics["first_request_ms"] is None and request.url.path.startswith("/api/"):
+        startup_metrics["first_request_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        startup_metrics["first_request_path"] = request.url.path
+    return response
 
 
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
+    emails_ready = emails_load_task is not None and emails_load_task.done()
+    llm = peek_llm_service()
+    llm_ready = llm is not None and (llm.warmup_ms is not None or not LLM_WARMUP)
     return {
-        "status": "healthy",
+        "status": "healthy" if emails_ready else "starting",
         "service": "Email Productivity Agent API",
-        "emails_loaded": len(emails_db)
+        "ready": emails_ready,
+        "llm_ready": llm_ready,
+        "emails_loaded": len(emails_db),
+        "metrics": {
+            **startup_metrics,
+            "llm_init_ms": llm.init_ms if llm else None,
+            "llm_warmup_ms": llm.warmup_ms if llm else None,
+            "llm_first_generation_ms": llm.first_generation_ms if llm else None
+        }
     }
 
 
@@ -76,6 +159,7 @@ async def health_check():
 @app.get("/api/emails", response_model=List[Email])
 async def get_emails(category: str = None, limit: int = 100):
     """Get all emails, optionally filtered by category."""
+    await wait_for_emails()
     if category:
         filtered = [e for e in emails_db if e.category and e.category.value == category]
         return filtered[:limit]
@@ -85,6 +169,7 @@ async def get_emails(category: str = None, limit: int = 100):
 @app.get("/api/emails/{email_id}", response_model=Email)
 async def get_email(email_id: str):
     """Get a specific email by ID."""
+    await wait_for_emails()
     email = next((e for e in emails_db if e.id == email_id), None)
     if not email:
         raise HTTPException(status_code=404, detail="Email not found")
@@ -94,11 +179,13 @@ async def get_email(email_id: str):
 @app.post("/api/emails/upload")
 async def upload_emails(file: UploadFile = File(...)):
     """Upload a JSON file containing emails."""
-    global emails_db
+    global emails_db, email_index
     
     if not file.filename.endswith('.json'):
         raise HTTPException(status_code=400, detail="File must be a JSON file")
     
+    await wait_for_emails()
+    
     try:
         content = await file.read()
         data = json.loads(content.decode('utf-8'))
@@ -106,6 +193,9 @@ async def upload_emails(file: UploadFile = File(...)):
         # Validate and load emails
         new_emails = [Email(**email) for email in data]
         emails_db = new_emails
+        email_index = {e.id: e for e in emails_db}
+        get_email_matcher().reset(emails_db)
+        get_change_feed().reset()
         
         # Optionally save to mock_emails.json
         with open(MOCK_EMAILS_FILE, 'w', encoding='utf-8') as f:
@@ -122,17 +212,74 @@ async def upload_emails(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail=f"Error processing file: {str(e)}")
 
 
+# Change feed endpoints
+CHANGE_STREAM_POLL_SECONDS = 1.0
+CHANGE_STREAM_HEARTBEAT_SECONDS = 15.0
+
+
+def build_change_set(since: Optional[str]) -> ChangeSet:
+    """Resolve the records changed since a cursor into a ChangeSet.
+    
+    Only the changed IDs are looked up, so the cost does not grow with the mailbox.
+    """
+    changes = get_change_feed().changes_since(since)
+    if changes["reset"] or not (changes[EMAIL] or changes[ACTION_ITEM]):
+        return ChangeSet(cursor=changes["cursor"], version=changes["version"], reset=changes["reset"])
+    
+    return ChangeSet(
+        cursor=changes["cursor"],
+        version=changes["version"],
+        emails=[email_index[i] for i in changes[EMAIL] if i in email_index],
+        action_items=[action_item_index[i] for i in changes[ACTION_ITEM] if i in action_item_index]
+    )
+
+
+@app.get("/api/changes", response_model=ChangeSet)
+async def get_changes(since: Optional[str] = None):
+    """Get emails and action items changed since a cursor.
+    
+    Omit `since` (or get `reset: true` back) to learn the current cursor,
+    then re-fetch everything once and poll with the returned cursor.
+    """
+    await wait_for_emails()
+    return build_change_set(since)
+
+
+@app.get("/api/changes/stream")
+async def stream_changes(request: Request, since: Optional[str] = None):
+    """Push change sets as server-sent events whenever the cursor moves."""
+    await wait_for_emails()
+    
+    async def event_stream():
+        cursor = since
+        last_sent = time.monotonic()
+        while not await request.is_disconnected():
+            if cursor != get_change_feed().cursor:
+                change_set = build_change_set(cursor)
+                cursor = change_set.cursor
+                last_sent = time.monotonic()
+                yield f"id: {cursor}\nevent: changes\ndata: {change_set.model_dump_json()}\n\n"
+            elif time.monotonic() - last_sent > CHANGE_STREAM_HEARTBEAT_SECONDS:
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(CHANGE_STREAM_POLL_SECONDS)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 # LLM-powered endpoints
 @app.post("/api/categorize")
 async def categorize_email(request: CategorizeRequest):
     """Categorize an email using LLM."""
-    llm = get_llm_service()
+    await wait_for_emails()
+    llm = await load_llm_service()
     category = llm.categorize_email(request.email)
     
     # Update email in database
     for email in emails_db:
         if email.id == request.email.id:
             email.category = EmailCategory(category)
+            get_change_feed().record(EMAIL, email.id)
             break
     
     return {"email_id": request.email.id, "category": category}
@@ -141,13 +288,15 @@ async def categorize_email(request: CategorizeRequest):
 @app.post("/api/categorize-all")
 async def categorize_all_emails():
     """Categorize all emails in the database."""
-    llm = get_llm_service()
+    await wait_for_emails()
+    llm = await load_llm_service()
     results = []
     
     for email in emails_db:
         category = llm.categorize_email(email)
         email.category = EmailCategory(category)
         results.append({"email_id": email.id, "category": category})
+    get_change_feed().record_many(EMAIL, [r["email_id"] for r in results])
     
     return {
         "success": True,
@@ -159,17 +308,21 @@ async def categorize_all_emails():
 @app.post("/api/extract-actions", response_model=List[ActionItem])
 async def extract_actions(request: ExtractActionsRequest):
     """Extract action items from an email."""
-    llm = get_llm_service()
+    await wait_for_emails()
+    llm = await load_llm_service()
     action_items = llm.extract_action_items(request.email)
     
     # Store action items
     global action_items_db
     action_items_db.extend(action_items)
+    action_item_index.update((item.id, item) for item in action_items)
+    get_change_feed().record_many(ACTION_ITEM, [item.id for item in action_items])
     
     # Update email with action items
     for email in emails_db:
         if email.id == request.email.id:
             email.action_items = action_items
+            get_change_feed().record(EMAIL, email.id)
             break
     
     return action_items
@@ -186,24 +339,27 @@ async def get_action_items(completed: bool = None):
 @app.post("/api/action-items/{item_id}/complete")
 async def complete_action_item(item_id: str):
     """Mark an action item as complete."""
-    item = next((i for i in action_items_db if i.id == item_id), None)
+    item = action_item_index.get(item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Action item not found")
     
     item.completed = True
+    get_change_feed().record(ACTION_ITEM, item.id)
     return {"success": True, "item_id": item_id}
 
 
 @app.post("/api/generate-reply")
 async def generate_reply(request: GenerateReplyRequest):
     """Generate a reply to an email."""
-    llm = get_llm_service()
+    await wait_for_emails()
+    llm = await load_llm_service()
     reply = llm.generate_reply(request.email, request.tone, request.context)
     
     # Update email with suggested reply
     for email in emails_db:
         if email.id == request.email.id:
             email.suggested_reply = reply["reply_text"]
+            get_change_feed().record(EMAIL, email.id)
             break
     
     return reply
@@ -212,26 +368,97 @@ async def generate_reply(request: GenerateReplyRequest):
 @app.post("/api/summarize")
 async def summarize_emails(request: SummarizeRequest):
     """Summarize a list of emails."""
-    llm = get_llm_service()
+    llm = await load_llm_service()
     summary = llm.summarize_emails(request.emails, request.focus or "general overview")
     return {"summary": summary}
 
 
+def resolve_email_ids(email_ids: List[str]) -> List[Email]:
+    """Look up emails by ID, skipping unknown IDs."""
+    return [email_index[email_id] for email_id in email_ids if email_id in email_index]
+
+
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat_with_agent(request: ChatRequest):
+async def chat_with_agent(request: ChatRequest, background_tasks: BackgroundTasks):
     """Chat with the email agent."""
-    llm = get_llm_service()
+    await wait_for_emails()
+    llm = await load_llm_service()
+    
+    # Continue a stored session; without one, answer statelessly from the history the client sent
+    session = None
+    if request.session_id:
+        session = get_session_store().get(request.session_id)
+        if not session:
+            raise HTTPException(status_code=404, detail="Chat session not found")
+        if request.email_ids is not None:
+            session.email_ids = request.email_ids
+    
+    # Use provided email context, referenced emails, or all emails
+    email_ids = session.email_ids if session else request.email_ids
+    email_matcher = get_email_matcher()
+    if request.email_context:
+        email_context = request.email_context
+        email_matcher = None  # Client-supplied emails are not indexed
+    elif email_ids:
+        email_context = resolve_email_ids(email_ids)
+    else:
+        email_context = emails_db
     
-    # Use provided email context or all emails
-    email_context = request.email_context if request.email_context else emails_db
+    if not session:
+        response = llm.chat_with_agent(
+            request.message,
+            request.conversation_history,
+            email_context,
+            email_matcher=email_matcher
+        )
+        return ChatResponse(**response)
     
+    summary, messages = session.history()
     response = llm.chat_with_agent(
         request.message,
-        request.conversation_history,
-        email_context
+        messages,
+        email_context,
+        conversation_summary=summary,
+        history_limit=None,
+        email_matcher=email_matcher
     )
     
-    return ChatResponse(**response)
+    session.add_message(ChatMessage(role="user", content=request.message))
+    session.add_message(ChatMessage(
+        role="assistant",
+        content=response["message"],
+        referenced_emails=response["referenced_emails"]
+    ))
+    # Fold older turns into the summary after the reply has been sent
+    if session.needs_compaction():
+        background_tasks.add_task(session.compact, llm.summarize_conversation)
+    
+    return ChatResponse(session_id=session.id, **response)
+
+
+@app.post("/api/chat/sessions", response_model=ChatSessionInfo)
+async def create_chat_session(request: ChatSessionCreate):
+    """Start a new server-side chat session."""
+    session = get_session_store().create()
+    session.email_ids = request.email_ids
+    return ChatSessionInfo(**session.to_dict())
+
+
+@app.get("/api/chat/sessions/{session_id}", response_model=ChatSessionInfo)
+async def get_chat_session(session_id: str):
+    """Get the summary and recent messages of a chat session."""
+    session = get_session_store().get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return ChatSessionInfo(**session.to_dict())
+
+
+@app.delete("/api/chat/sessions/{session_id}")
+async def delete_chat_session(session_id: str):
+    """Delete a chat session."""
+    if not get_session_store().delete(session_id):
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return {"success": True, "session_id": session_id}
 
 
 # Prompt management endpoints
@@ -245,12 +472,28 @@ async def get_prompts():
 @app.post("/api/prompts/update")
 async def update_prompt_endpoint(request: PromptUpdate):
     """Update a specific prompt."""
+    try:
+        validate_prompt(request.prompt_type, request.prompt_text)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     success = update_prompt(request.prompt_type, request.prompt_text)
     if success:
         return {"success": True, "message": f"Updated {request.prompt_type} prompt"}
     raise HTTPException(status_code=500, detail="Failed to update prompt")
 
 
+@app.post("/api/prompts/evaluate", response_model=PromptEvaluationReport)
+async def evaluate_prompt_endpoint(request: PromptEvaluationRequest):
+    """Compare an edited prompt with the current one before saving it."""
+    await wait_for_emails()
+    llm = await load_llm_service()
+    try:
+        return await evaluate_prompt(llm, emails_db, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.post("/api/prompts/reset")
 async def reset_prompts_endpoint():
     """Reset all prompts to defaults."""
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal
 from datetime import datetime
 from enum import Enum
 
@@ -61,16 +61,34 @@ class ChatMessage(BaseModel):
 
 class ChatRequest(BaseModel):
     message: str
+    session_id: Optional[str] = None
+    email_ids: Optional[List[str]] = None
+    # Stateless fields: only used when no session_id is given
     conversation_history: List[ChatMessage] = []
     email_context: Optional[List[Email]] = None
 
 
 class ChatResponse(BaseModel):
     message: str
+    session_id: Optional[str] = None
     referenced_emails: Optional[List[str]] = None
     suggested_actions: Optional[List[str]] = None
 
 
+class ChatSessionCreate(BaseModel):
+    email_ids: Optional[List[str]] = None
+
+
+class ChatSessionInfo(BaseModel):
+    session_id: str
+    created_at: str
+    updated_at: str
+    summary: str = ""
+    messages: List[ChatMessage] = []
+    message_count: int = 0
+    email_ids: Optional[List[str]] = None
+
+
 class PromptConfig(BaseModel):
     categorization: str
     action_extraction: str
@@ -101,3 +119,50 @@ class GenerateReplyRequest(BaseModel):
 class SummarizeRequest(BaseModel):
     emails: List[Email]
     focus: Optional[str] = None
+
+
+class ChangeSet(BaseModel):
+    # Opaque "<epoch>:<version>" value to pass back as `since`
+    cursor: str
+    version: int
+    reset: bool = False
+    emails: List[Email] = []
+    action_items: List[ActionItem] = []
+
+
+class PromptEvaluationRequest(BaseModel):
+    prompt_type: Literal["categorization", "action_extraction", "reply_generation"]
+    prompt_text: str
+    email_ids: Optional[List[str]] = None
+    # Expected output per email ID (e.g. the correct category)
+    labels: Optional[Dict[str, str]] = None
+    sample_size: int = Field(default=10, ge=1, le=100)
+    seed: int = 0
+
+
+class PromptEvaluationCase(BaseModel):
+    email_id: str
+    baseline_output: str
+    candidate_output: str
+    agreement: float
+    label: Optional[str] = None
+
+
+class PromptVariantReport(BaseModel):
+    parse_failure_rate: float
+    # Latency and token cost cover only the calls made in this run
+    fresh_calls: int
+    avg_latency_ms: Optional[float] = None
+    max_latency_ms: Optional[float] = None
+    estimated_tokens: int
+    cache_hits: int = 0
+    label_accuracy: Optional[float] = None
+
+
+class PromptEvaluationReport(BaseModel):
+    prompt_type: str
+    sample_size: int
+    agreement: float
+    baseline: PromptVariantReport
+    candidate: PromptVariantReport
+    cases: List[PromptEvaluationCase]
@@ -0,0 +1,102 @@
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Record kinds tracked by the change feed
+EMAIL = "email"
+ACTION_ITEM = "action_item"
+
+
+class ChangeFeed:
+    """Monotonically versioned log of changed emails and action items.
+
+    Only the latest version of each record is kept, ordered by version, so
+    reading the changes since a version costs O(changed records) rather
+    than O(mailbox size).
+
+    Clients hold a cursor of the form "<epoch>:<version>". The epoch is new
+    in every process, so a cursor from before a restart always forces a reset.
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:12]
+        self.version = 0
+        # Clients older than this must do a full re-fetch (e.g. after an upload)
+        self.reset_version = 0
+        self._changes: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, record_id: str) -> int:
+        """Mark a record as changed and return the new version."""
+        with self._lock:
+            self.version += 1
+            key = (kind, record_id)
+            self._changes[key] = self.version
+            self._changes.move_to_end(key)
+            return self.version
+
+    @property
+    def cursor(self) -> str:
+        return f"{self.epoch}:{self.version}"
+
+    def record_many(self, kind: str, record_ids: List[str]) -> int:
+        """Mark several records as changed under one new version."""
+        with self._lock:
+            if not record_ids:
+                return self.version
+            self.version += 1
+            for record_id in record_ids:
+                key = (kind, record_id)
+                self._changes[key] = self.version
+                self._changes.move_to_end(key)
+            return self.version
+
+    def reset(self) -> int:
+        """Invalidate all earlier versions, e.g. when the mailbox is replaced."""
+        with self._lock:
+            self.version += 1
+            self.reset_version = self.version
+            self._changes.clear()
+            return self.version
+
+    def _parse_cursor(self, cursor: Optional[str]) -> Optional[int]:
+        """Return the version in a cursor from this process, or None."""
+        if not cursor:
+            return None
+        epoch, _, version = cursor.partition(":")
+        if epoch != self.epoch or not version.isdigit():
+            return None
+        return int(version)
+
+    def changes_since(self, cursor: Optional[str]) -> Dict:
+        """Return the IDs of records changed after a cursor.
+
+        `reset` is True when the client has no cursor, or one from another
+        process or from before the last reset, and should re-fetch everything.
+        """
+        with self._lock:
+            since = self._parse_cursor(cursor)
+            if since is None or since < self.reset_version or since > self.version:
+                return {"cursor": self.cursor, "version": self.version, "reset": True, EMAIL: [], ACTION_ITEM: []}
+
+            changed: Dict[str, List[str]] = {EMAIL: [], ACTION_ITEM: []}
+            for (kind, record_id), version in reversed(self._changes.items()):
+                if version <= since:
+                    break
+                changed[kind].append(record_id)
+            for record_ids in changed.values():
+                record_ids.reverse()  # Oldest change first
+
+            return {"cursor": self.cursor, "version": self.version, "reset": False, **changed}
+
+
+# Singleton instance
+_change_feed = None
+
+def get_change_feed() -> ChangeFeed:
+    """Get or create the change feed."""
+    global _change_feed
+    if _change_feed is None:
+        _change_feed = ChangeFeed()
+    return _change_feed
@@ -0,0 +1,172 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from models.schemas import ChatMessage
+
+# Number of most recent messages that are always sent to the LLM verbatim
+RECENT_MESSAGES = int(os.getenv("CHAT_RECENT_MESSAGES", "6"))
+# Older messages are folded into the summary once this many have piled up
+COMPACTION_BATCH = int(os.getenv("CHAT_COMPACTION_BATCH", "4"))
+# Upper bound on the running summary length (characters)
+MAX_SUMMARY_CHARS = int(os.getenv("CHAT_MAX_SUMMARY_CHARS", "1500"))
+# Least recently used sessions are evicted beyond this many
+MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "200"))
+
+COMPACTION_PROMPT = """You maintain a running summary of a conversation between a user and an email assistant.
+
+Current summary:
+{summary}
+
+New messages to fold into the summary:
+{messages}
+
+Rewrite the summary so it includes the new messages. Keep the emails, people, decisions and open questions that were discussed.
+Respond with ONLY the updated summary, in under 150 words."""
+
+
+class ChatSession:
+    """Conversation state kept on the server between chat turns."""
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.created_at = datetime.utcnow().isoformat()
+        self.updated_at = self.created_at
+        # Messages not yet folded into the summary
+        self.messages: List[ChatMessage] = []
+        self.summary: str = ""
+        self.summarized_count: int = 0
+        self.email_ids: Optional[List[str]] = None
+        self._compacting = False
+        # Guards messages/summary: compaction runs in a worker thread while
+        # new turns are appended on the event loop
+        self._lock = threading.Lock()
+
+    @property
+    def message_count(self) -> int:
+        with self._lock:
+            return self.summarized_count + len(self.messages)
+
+    def add_message(self, message: ChatMessage):
+        """Append a message to the session history."""
+        if not message.timestamp:
+            message.timestamp = datetime.utcnow().isoformat()
+        with self._lock:
+            self.messages.append(message)
+            self.updated_at = datetime.utcnow().isoformat()
+
+    def needs_compaction(self) -> bool:
+        """Whether enough old messages have piled up to be summarized."""
+        with self._lock:
+            return len(self.messages) - RECENT_MESSAGES >= COMPACTION_BATCH
+
+    def compact(self, summarize: Callable[[str], str]):
+        """Fold all but the most recent messages into the running summary.
+
+        The summary is cached on the session, so each message is only ever
+        sent to the summarizer once no matter how long the conversation gets.
+        The lock is not held while `summarize` runs, so turns can still be
+        added during compaction.
+        """
+        with self._lock:
+            overflow = len(self.messages) - RECENT_MESSAGES
+            if overflow <= 0 or self._compacting:
+                return
+            self._compacting = True
+            old_messages = self.messages[:overflow]
+            previous_summary = self.summary
+
+        try:
+            summary = self._summarize(old_messages, previous_summary, summarize)
+            with self._lock:
+                self.summary = summary
+                self.summarized_count += overflow
+                # Messages appended meanwhile sit after the folded prefix
+                del self.messages[:overflow]
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def _summarize(
+        self,
+        old_messages: List[ChatMessage],
+        previous_summary: str,
+        summarize: Callable[[str], str]
+    ) -> str:
+        messages_text = "\n".join(
+            f"{msg.role.capitalize()}: {msg.content}" for msg in old_messages
+        )
+        prompt = COMPACTION_PROMPT.format(
+            summary=previous_summary or "No summary yet",
+            messages=messages_text
+        )
+
+        summary = summarize(prompt).strip()
+        if not summary or summary.startswith("Error"):
+            # Fall back to a plain transcript so the turns are not lost
+            summary = f"{previous_summary}\n{messages_text}".strip()
+
+        return summary[-MAX_SUMMARY_CHARS:]
+
+    def history(self) -> Tuple[str, List[ChatMessage]]:
+        """Return the summary and a copy of the unsummarized messages."""
+        with self._lock:
+            return self.summary, list(self.messages)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "session_id": self.id,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at,
+                "summary": self.summary,
+                "messages": list(self.messages),
+                "message_count": self.summarized_count + len(self.messages),
+                "email_ids": self.email_ids
+            }
+
+
+class ChatSessionStore:
+    """In-memory LRU store of chat sessions."""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self) -> ChatSession:
+        """Create and store a new, empty session."""
+        session = ChatSession(uuid.uuid4().hex)
+
+        with self._lock:
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        """Get a session by ID and mark it as recently used."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id: str) -> bool:
+        """Delete a session. Returns False if it did not exist."""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+
+# Singleton instance
+_session_store = None
+
+def get_session_store() -> ChatSessionStore:
+    """Get or create the chat session store."""
+    global _session_store
+    if _session_store is None:
+        _session_store = ChatSessionStore()
+    return _session_store
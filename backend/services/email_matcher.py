@@ -0,0 +1,169 @@
+import re
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set
+
+from models.schemas import Email
+
+# Weight of a literal email ID mention compared to a subject mention
+ID_MATCH_SCORE = 2.0
+# Subjects this long (after normalization) get the full subject score
+FULL_SUBJECT_LENGTH = 40
+# Subjects shorter than this are too generic to count as a reference
+MIN_SUBJECT_LENGTH = 4
+# Each extra mention adds this much, up to the cap. The cap keeps a
+# subject-only email (at most 1.0 + cap) below any ID match.
+REPEAT_MENTION_BONUS = 0.05
+MAX_REPEAT_BONUS = 0.3
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase text and collapse whitespace for matching."""
+    return _WHITESPACE_RE.sub(" ", text.lower()).strip()
+
+
+class EmailMatcher:
+    """Aho-Corasick matcher over email IDs and normalized subjects.
+
+    Finds every email referenced in a piece of text in a single pass,
+    regardless of how many emails are indexed.
+    """
+
+    def __init__(self, emails: Optional[Iterable[Email]] = None):
+        self._lock = threading.Lock()
+        self.reset(emails or [])
+
+    def reset(self, emails: Iterable[Email]):
+        """Replace the indexed emails."""
+        with self._lock:
+            self._goto: List[Dict[str, int]] = [{}]
+            self._terminal: List[Optional[str]] = [None]
+            self._fail: List[int] = [0]
+            self._out: List[List[str]] = [[]]
+            # pattern -> {email_id: "id" | "subject"}
+            self._patterns: Dict[str, Dict[str, str]] = {}
+            self._email_ids: Set[str] = set()
+            self._dirty = False
+        self.add_emails(emails)
+
+    def add_emails(self, emails: Iterable[Email]):
+        """Index new emails. Failure links are rebuilt lazily on the next search."""
+        with self._lock:
+            for email in emails:
+                self._email_ids.add(email.id)
+                self._add_pattern(normalize_text(email.id), email.id, "id")
+                subject = normalize_text(email.subject)
+                if len(subject) >= MIN_SUBJECT_LENGTH:
+                    self._add_pattern(subject, email.id, "subject")
+
+    def __contains__(self, email_id: str) -> bool:
+        return email_id in self._email_ids
+
+    def _add_pattern(self, pattern: str, email_id: str, kind: str):
+        if not pattern:
+            return
+        owners = self._patterns.setdefault(pattern, {})
+        # An ID match outranks a subject match for the same email
+        if owners.get(email_id) != "id":
+            owners[email_id] = kind
+
+        state = 0
+        for ch in pattern:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._terminal.append(None)
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][ch] = next_state
+            state = next_state
+        self._terminal[state] = pattern
+        self._dirty = True
+
+    def _build(self):
+        """Compute failure links and merged outputs (breadth-first)."""
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            queue.append(state)
+        self._out[0] = []
+
+        while queue:
+            state = queue.popleft()
+            fail_out = self._out[self._fail[state]] if state else []
+            own = [self._terminal[state]] if self._terminal[state] else []
+            self._out[state] = own + fail_out
+
+            for ch, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                queue.append(child)
+
+        self._dirty = False
+
+    def find_references(
+        self,
+        text: str,
+        allowed_ids: Optional[Set[str]] = None,
+        limit: Optional[int] = None
+    ) -> List[str]:
+        """Return IDs of emails referenced in text, best matches first."""
+        with self._lock:
+            if self._dirty:
+                self._build()
+
+            normalized = normalize_text(text)
+            best_scores: Dict[str, float] = {}
+            mentions: Dict[str, int] = {}
+            first_seen: Dict[str, int] = {}
+
+            state = 0
+            for idx, ch in enumerate(normalized):
+                while state and ch not in self._goto[state]:
+                    state = self._fail[state]
+                state = self._goto[state].get(ch, 0)
+
+                for pattern in self._out[state]:
+                    start = idx - len(pattern) + 1
+                    # Only count whole-word matches
+                    if start > 0 and normalized[start - 1].isalnum() and pattern[0].isalnum():
+                        continue
+                    end = idx + 1
+                    if end < len(normalized) and normalized[end].isalnum() and pattern[-1].isalnum():
+                        continue
+
+                    for email_id, kind in self._patterns[pattern].items():
+                        if allowed_ids is not None and email_id not in allowed_ids:
+                            continue
+                        if kind == "id":
+                            score = ID_MATCH_SCORE
+                        else:
+                            score = min(1.0, len(pattern) / FULL_SUBJECT_LENGTH)
+                        # Keep the best kind of match regardless of mention order
+                        best_scores[email_id] = max(score, best_scores.get(email_id, 0.0))
+                        mentions[email_id] = mentions.get(email_id, 0) + 1
+                        first_seen.setdefault(email_id, start)
+
+        scores = {
+            email_id: best + min(MAX_REPEAT_BONUS, REPEAT_MENTION_BONUS * (mentions[email_id] - 1))
+            for email_id, best in best_scores.items()
+        }
+        ranked = sorted(scores, key=lambda email_id: (-scores[email_id], first_seen[email_id]))
+        return ranked[:limit] if limit else ranked
+
+
+# Singleton instance
+_email_matcher = None
+
+def get_email_matcher() -> EmailMatcher:
+    """Get or create the matcher over the loaded emails."""
+    global _email_matcher
+    if _email_matcher is None:
+        _email_matcher = EmailMatcher()
+    return _email_matcher
@@ -1,19 +1,30 @@
 import os
 import json
-from typing import List, Dict, Optional, Any
+import threading
+import time
+from typing import List, Dict, Optional, Any, Union
 from models.schemas import Email, ActionItem, ChatMessage, Priority
 from services.prompt_service import format_prompt
+from services.email_matcher import EmailMatcher
 import re
 
-# Check which LLM to use
-USE_OLLAMA = os.getenv("USE_OLLAMA", "1") == "1"
+# LLM backends (langchain_ollama / google.genai) are imported lazily in
+# LLMService.__init__ so that importing this module stays cheap at startup.
 
-if USE_OLLAMA:
-    from langchain_ollama import OllamaLLM
-    from langchain_core.prompts import ChatPromptTemplate
-else:
-    from google import genai
-    from google.genai import types
+
+def parse_keep_alive(value: Optional[str]) -> Optional[Union[int, str]]:
+    """Convert OLLAMA_KEEP_ALIVE for Ollama.
+    
+    Ollama parses string values as Go durations, which need a unit, so plain
+    numbers ("-1", "0", "300") are passed as integer seconds instead.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return int(value)
+    except ValueError:
+        return value
 
 
 class LLMService:
@@ -21,17 +32,26 @@ class LLMService:
     
     def __init__(self):
         """Initialize the LLM client based on USE_OLLAMA flag."""
-        self.use_ollama = USE_OLLAMA
+        self.use_ollama = os.getenv("USE_OLLAMA", "1") == "1"
+        self.init_ms: Optional[float] = None
+        self.warmup_ms: Optional[float] = None
+        self.first_generation_ms: Optional[float] = None
+        started = time.perf_counter()
         
         if self.use_ollama:
             # Initialize Ollama
             model_name = os.getenv("OLLAMA_MODEL", "llama3.2:latest")
             base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+            # How long Ollama keeps the model loaded after a request (e.g. "30m", "-1" for forever)
+            keep_alive = parse_keep_alive(os.getenv("OLLAMA_KEEP_ALIVE"))
             
             try:
+                from langchain_ollama import OllamaLLM
+                
                 self.ollama_model = OllamaLLM(
                     model=model_name,
-                    base_url=base_url
+                    base_url=base_url,
+                    keep_alive=keep_alive
                 )
                 print(f"✓ Using Ollama model: {model_name}")
                 self.client = None
@@ -45,14 +65,35 @@ class LLMService:
                 print("WARNING: GEMINI_API_KEY not set. LLM features will not work.")
                 self.client = None
             else:
+                from google import genai
+                
                 self.client = genai.Client(api_key=api_key)
                 print("✓ Using Google Gemini API")
             
             self.model_name = "gemini-2.0-flash-exp"
             self.ollama_model = None
+        
+        self.init_ms = round((time.perf_counter() - started) * 1000, 1)
+    
+    def warm_up(self):
+        """Send a tiny prompt so the model is loaded before the first real request."""
+        started = time.perf_counter()
+        response = self._generate_content("Reply with OK.", temperature=0.0, record_latency=False)
+        if response.startswith("Error"):
+            print(f"WARNING: LLM warm-up failed: {response}")
+            return
+        self.warmup_ms = round((time.perf_counter() - started) * 1000, 1)
+        print(f"✓ LLM warmed up in {self.warmup_ms} ms")
     
-    def _generate_content(self, prompt: str, temperature: float = 0.7) -> str:
+    def _generate_content(self, prompt: str, temperature: float = 0.7, record_latency: bool = True) -> str:
         """Generate content using either Ollama or Gemini API."""
+        started = time.perf_counter()
+        response = self._call_backend(prompt, temperature)
+        if record_latency and self.first_generation_ms is None:
+            self.first_generation_ms = round((time.perf_counter() - started) * 1000, 1)
+        return response
+    
+    def _call_backend(self, prompt: str, temperature: float) -> str:
         if self.use_ollama:
             # Use Ollama
             if not self.ollama_model:
@@ -70,6 +111,8 @@ class LLMService:
                 return "Error: API key not configured"
             
             try:
+                from google.genai import types
+                
                 response = self.client.models.generate_content(
                     model=self.model_name,
                     contents=prompt,
@@ -83,38 +126,55 @@ class LLMService:
                 print(f"Error generating content with Gemini: {e}")
                 return f"Error: {str(e)}"
     
-    def categorize_email(self, email: Email) -> str:
-        """Categorize an email into predefined categories."""
-        prompt = format_prompt(
-            "categorization",
-            subject=email.subject,
-            sender=email.sender,
-            body=email.body[:1000]  # Limit body length
-        )
-        
-        response = self._generate_content(prompt, temperature=0.3)
-        
-        # Extract category from response
+    def _build_email_prompt(
+        self,
+        prompt_type: str,
+        email: Email,
+        prompt_template: Optional[str] = None,
+        tone: str = "professional",
+        context: str = ""
+    ) -> str:
+        """Format a single-email prompt, optionally with a candidate template."""
+        if prompt_type == "categorization":
+            return format_prompt(
+                "categorization",
+                template=prompt_template,
+                subject=email.subject,
+                sender=email.sender,
+                body=email.body[:1000]  # Limit body length
+            )
+        if prompt_type == "action_extraction":
+            return format_prompt(
+                "action_extraction",
+                template=prompt_template,
+                subject=email.subject,
+                sender=email.sender,
+                body=email.body
+            )
+        if prompt_type == "reply_generation":
+            return format_prompt(
+                "reply_generation",
+                template=prompt_template,
+                subject=email.subject,
+                sender=email.sender,
+                body=email.body,
+                tone=tone,
+                context=context or "No additional context"
+            )
+        raise ValueError(f"{prompt_type} prompts do not take a single email")
+    
+    def _parse_category(self, response: str) -> Optional[str]:
+        """Extract a category from the response, or None if there is none."""
         response = response.strip()
         valid_categories = ["Important", "To-Do", "Informational", "Newsletter", "Spam"]
         
         for category in valid_categories:
             if category.lower() in response.lower():
                 return category
-        
-        return "Informational"  # Default fallback
+        return None
     
-    def extract_action_items(self, email: Email) -> List[ActionItem]:
-        """Extract action items from an email."""
-        prompt = format_prompt(
-            "action_extraction",
-            subject=email.subject,
-            sender=email.sender,
-            body=email.body
-        )
-        
-        response = self._generate_content(prompt, temperature=0.4)
-        
+    def _parse_action_items(self, response: str, email: Email) -> Optional[List[ActionItem]]:
+        """Parse action items from the response, or None if it is not valid JSON."""
         try:
             # Try to extract JSON from response
             json_match = re.search(r'\[.*\]', response, re.DOTALL)
@@ -139,19 +199,25 @@ class LLMService:
             return action_items
         except Exception as e:
             print(f"Error parsing action items: {e}")
-            return []
+            return None
+    
+    def categorize_email(self, email: Email) -> str:
+        """Categorize an email into predefined categories."""
+        prompt = self._build_email_prompt("categorization", email)
+        response = self._generate_content(prompt, temperature=0.3)
+        
+        return self._parse_category(response) or "Informational"  # Default fallback
+    
+    def extract_action_items(self, email: Email) -> List[ActionItem]:
+        """Extract action items from an email."""
+        prompt = self._build_email_prompt("action_extraction", email)
+        response = self._generate_content(prompt, temperature=0.4)
+        
+        return self._parse_action_items(response, email) or []
     
     def generate_reply(self, email: Email, tone: str = "professional", context: str = "") -> Dict[str, Any]:
         """Generate a reply to an email."""
-        prompt = format_prompt(
-            "reply_generation",
-            subject=email.subject,
-            sender=email.sender,
-            body=email.body,
-            tone=tone,
-            context=context or "No additional context"
-        )
-        
+        prompt = self._build_email_prompt("reply_generation", email, tone=tone, context=context)
         response = self._generate_content(prompt, temperature=0.7)
         
         # Calculate a simple confidence score based on response length and coherence
@@ -163,6 +229,36 @@ class LLMService:
             "confidence_score": round(confidence, 2)
         }
     
+    def run_email_prompt(
+        self,
+        prompt_type: str,
+        email: Email,
+        prompt_template: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Run a single-email prompt and report its raw output and parse status.
+        
+        Used to evaluate prompt edits; the output is a comparable string
+        (category name, one action description per line, or reply text).
+        """
+        prompt = self._build_email_prompt(prompt_type, email, prompt_template)
+        temperature = {"categorization": 0.3, "action_extraction": 0.4}.get(prompt_type, 0.7)
+        response = self._generate_content(prompt, temperature=temperature)
+        
+        if response.startswith("Error"):
+            output, parsed = "", False
+        elif prompt_type == "categorization":
+            category = self._parse_category(response)
+            output, parsed = category or "", category is not None
+        elif prompt_type == "action_extraction":
+            items = self._parse_action_items(response, email)
+            output = "\n".join(item.description for item in items or [])
+            parsed = items is not None
+        else:
+            output = response.strip()
+            parsed = bool(output)
+        
+        return {"prompt": prompt, "response": response, "output": output, "parsed": parsed}
+    
     def summarize_emails(self, emails: List[Email], focus: str = "general overview") -> str:
         """Summarize a list of emails."""
         # Format emails for the prompt
@@ -183,18 +279,28 @@ class LLMService:
         response = self._generate_content(prompt, temperature=0.5)
         return response.strip()
     
+    def summarize_conversation(self, prompt: str) -> str:
+        """Generate a running summary of older chat turns."""
+        return self._generate_content(prompt, temperature=0.3)
+    
     def chat_with_agent(
         self,
         user_message: str,
         conversation_history: List[ChatMessage],
-        email_context: Optional[List[Email]] = None
+        email_context: Optional[List[Email]] = None,
+        conversation_summary: Optional[str] = None,
+        history_limit: Optional[int] = 5,
+        email_matcher: Optional[EmailMatcher] = None
     ) -> Dict[str, Any]:
         """Handle conversational queries about emails."""
-        # Format conversation history
+        # Format conversation history (last few messages unless the caller already bounded it)
+        recent_history = conversation_history[-history_limit:] if history_limit else conversation_history
         history_text = "\n".join([
             f"{msg.role.capitalize()}: {msg.content}"
-            for msg in conversation_history[-5:]  # Last 5 messages for context
+            for msg in recent_history
         ])
+        if conversation_summary:
+            history_text = f"Summary of earlier conversation: {conversation_summary}\n\n{history_text}".strip()
         
         # Format email context
         if email_context:
@@ -217,26 +323,38 @@ class LLMService:
         
         response = self._generate_content(prompt, temperature=0.7)
         
-        # Try to extract referenced email IDs from response
+        # Find referenced email IDs in one pass over the response
         referenced_emails = []
         if email_context:
-            for email in email_context:
-                if email.id in response or email.subject.lower() in response.lower():
-                    referenced_emails.append(email.id)
+            if email_matcher is None:
+                email_matcher = EmailMatcher(email_context)
+            referenced_emails = email_matcher.find_references(
+                response,
+                allowed_ids={email.id for email in email_context},
+                limit=5  # Best 5 references
+            )
         
         return {
             "message": response.strip(),
-            "referenced_emails": referenced_emails[:5],  # Limit to 5 references
+            "referenced_emails": referenced_emails,
             "suggested_actions": []  # Could be enhanced to extract action suggestions
         }
 
 
 # Singleton instance
 _llm_service = None
+_llm_service_lock = threading.Lock()
 
 def get_llm_service() -> LLMService:
     """Get or create the LLM service instance."""
     global _llm_service
     if _llm_service is None:
-        _llm_service = LLMService()
+        with _llm_service_lock:
+            if _llm_service is None:
+                _llm_service = LLMService()
+    return _llm_service
+
+
+def peek_llm_service() -> Optional[LLMService]:
+    """Return the LLM service if it has been created, without creating it."""
     return _llm_service
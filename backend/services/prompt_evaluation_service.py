@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import os
+import random
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from models.schemas import (
+    Email, PromptEvaluationRequest, PromptEvaluationCase, PromptVariantReport,
+    PromptEvaluationReport
+)
+from services.prompt_service import get_prompt, validate_prompt
+
+# Number of LLM calls in flight at once during an evaluation
+EVAL_CONCURRENCY = int(os.getenv("PROMPT_EVAL_CONCURRENCY", "4"))
+# Outputs cached per (prompt, email) so the baseline is not re-run every time
+MAX_CACHED_RESULTS = 2000
+# Rough token estimate; neither backend reports usage through our client
+CHARS_PER_TOKEN = 4
+
+_WORD_RE = re.compile(r"\w+")
+_result_cache: "OrderedDict[Tuple[str, str, str, str], Dict[str, Any]]" = OrderedDict()
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _cache_key(prompt_type: str, template: str, email: Email) -> Tuple[str, str, str, str]:
+    return (prompt_type, _digest(template), email.id, _digest(email.subject + email.body))
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of a piece of text."""
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+def similarity(prompt_type: str, a: str, b: str) -> float:
+    """Score how closely two outputs agree, from 0 to 1.
+
+    Categories must match exactly; free-text outputs are compared by word overlap.
+    """
+    if prompt_type == "categorization":
+        return 1.0 if a.strip().lower() == b.strip().lower() else 0.0
+
+    words_a = set(_WORD_RE.findall(a.lower()))
+    words_b = set(_WORD_RE.findall(b.lower()))
+    if not words_a and not words_b:
+        return 1.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+def select_emails(emails: List[Email], request: PromptEvaluationRequest) -> List[Email]:
+    """Pick the emails to evaluate on: explicit IDs, labeled emails, or a seeded sample.
+
+    Every path is capped at `sample_size`. Sampling is seeded so repeated
+    evaluations hit the same emails and reuse cached baseline outputs.
+    """
+    email_index = {e.id: e for e in emails}
+    if request.email_ids:
+        return [email_index[i] for i in request.email_ids if i in email_index][:request.sample_size]
+    if request.labels:
+        return [email_index[i] for i in request.labels if i in email_index][:request.sample_size]
+
+    sample_size = min(request.sample_size, len(emails))
+    return random.Random(request.seed).sample(emails, sample_size)
+
+
+def _run_case(llm, prompt_type: str, template: str, email: Email) -> Dict[str, Any]:
+    """Run one prompt on one email and measure it."""
+    started = time.perf_counter()
+    result = llm.run_email_prompt(prompt_type, email, template)
+    return {
+        "output": result["output"],
+        "parsed": result["parsed"],
+        "failed": result["response"].startswith("Error"),
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        "tokens": estimate_tokens(result["prompt"]) + estimate_tokens(result["response"])
+    }
+
+
+async def _run_variant(
+    llm,
+    prompt_type: str,
+    template: str,
+    emails: List[Email],
+    semaphore: asyncio.Semaphore
+) -> List[Tuple[Dict[str, Any], bool]]:
+    """Run a prompt over the emails concurrently, reusing cached outputs."""
+
+    async def run_one(email: Email) -> Tuple[Dict[str, Any], bool]:
+        key = _cache_key(prompt_type, template, email)
+        if key in _result_cache:
+            _result_cache.move_to_end(key)
+            return _result_cache[key], True
+
+        async with semaphore:
+            result = await asyncio.to_thread(_run_case, llm, prompt_type, template, email)
+
+        # Don't cache backend errors, they say nothing about the prompt
+        if not result["failed"]:
+            _result_cache[key] = result
+            while len(_result_cache) > MAX_CACHED_RESULTS:
+                _result_cache.popitem(last=False)
+        return result, False
+
+    return await asyncio.gather(*(run_one(email) for email in emails))
+
+
+def _variant_report(
+    prompt_type: str,
+    results: List[Tuple[Dict[str, Any], bool]],
+    labels: List[Optional[str]]
+) -> PromptVariantReport:
+    fresh = [result for result, cached in results if not cached]
+    latencies = [result["latency_ms"] for result in fresh]
+    scored = [
+        similarity(prompt_type, result["output"], label)
+        for (result, _), label in zip(results, labels)
+        if label is not None
+    ]
+    return PromptVariantReport(
+        parse_failure_rate=round(sum(not result["parsed"] for result, _ in results) / len(results), 3),
+        fresh_calls=len(fresh),
+        avg_latency_ms=round(sum(latencies) / len(latencies), 1) if latencies else None,
+        max_latency_ms=max(latencies) if latencies else None,
+        estimated_tokens=sum(result["tokens"] for result in fresh),
+        cache_hits=sum(cached for _, cached in results),
+        label_accuracy=round(sum(scored) / len(scored), 3) if scored else None
+    )
+
+
+async def evaluate_prompt(llm, emails: List[Email], request: PromptEvaluationRequest) -> PromptEvaluationReport:
+    """Compare a candidate prompt against the current one on a set of emails.
+
+    Raises ValueError if the candidate uses placeholders its prompt type
+    does not provide, before anything is sent to the model.
+    """
+    validate_prompt(request.prompt_type, request.prompt_text)
+    selected = select_emails(emails, request)
+    if not selected:
+        raise ValueError("No emails to evaluate on")
+
+    baseline_template = get_prompt(request.prompt_type)
+    semaphore = asyncio.Semaphore(EVAL_CONCURRENCY)
+    baseline, candidate = await asyncio.gather(
+        _run_variant(llm, request.prompt_type, baseline_template, selected, semaphore),
+        _run_variant(llm, request.prompt_type, request.prompt_text, selected, semaphore)
+    )
+
+    labels = [(request.labels or {}).get(email.id) for email in selected]
+    cases = [
+        PromptEvaluationCase(
+            email_id=email.id,
+            baseline_output=base["output"],
+            candidate_output=cand["output"],
+            # Outputs that failed to parse never count as agreeing
+            agreement=round(similarity(request.prompt_type, base["output"], cand["output"]), 3)
+            if base["parsed"] and cand["parsed"] else 0.0,
+            label=label
+        )
+        for email, (base, _), (cand, _), label in zip(selected, baseline, candidate, labels)
+    ]
+
+    return PromptEvaluationReport(
+        prompt_type=request.prompt_type,
+        sample_size=len(selected),
+        agreement=round(sum(case.agreement for case in cases) / len(cases), 3),
+        baseline=_variant_report(request.prompt_type, baseline, labels),
+        candidate=_variant_report(request.prompt_type, candidate, labels),
+        cases=cases
+    )
@@ -1,7 +1,8 @@
 import json
 import os
+import string
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 
 # Default prompts for the email agent
 DEFAULT_PROMPTS = {
@@ -89,6 +90,15 @@ User query: {user_message}
 Provide a helpful, conversational response."""
 }
 
+# Variables each prompt is formatted with
+PROMPT_VARIABLES = {
+    "categorization": {"subject", "sender", "body"},
+    "action_extraction": {"subject", "sender", "body"},
+    "reply_generation": {"subject", "sender", "body", "tone", "context"},
+    "summarization": {"emails", "focus"},
+    "chat_system": {"conversation_history", "email_context", "user_message"},
+}
+
 PROMPTS_FILE = Path(__file__).parent.parent / "data" / "prompts.json"
 
 
@@ -139,11 +149,50 @@ def reset_prompts() -> bool:
     return save_prompts(DEFAULT_PROMPTS.copy())
 
 
-def format_prompt(prompt_type: str, **kwargs) -> str:
-    """Get and format a prompt with provided variables."""
-    prompt = get_prompt(prompt_type)
+def validate_prompt(prompt_type: str, prompt_text: str):
+    """Check that a prompt only uses the variables its type is formatted with.
+    
+    Raises ValueError for unknown, positional, nested or malformed
+    placeholders, or any that would fail when the prompt is formatted.
+    """
+    allowed = PROMPT_VARIABLES.get(prompt_type, set())
+    variables = ", ".join(sorted(allowed))
+    try:
+        fields = [
+            (field, format_spec)
+            for _, field, format_spec, _ in string.Formatter().parse(prompt_text)
+            if field is not None
+        ]
+    except ValueError as e:
+        raise ValueError(f"Invalid placeholder syntax in {prompt_type} prompt: {e}")
+    
+    for field, format_spec in fields:
+        if field == "" or field.isdigit():
+            raise ValueError(f"Positional placeholder {{{field}}} is not allowed; use one of: {variables}")
+        if field not in allowed:
+            raise ValueError(f"Unknown placeholder {{{field}}} in {prompt_type} prompt; use one of: {variables}")
+        if "{" in format_spec or "}" in format_spec:
+            raise ValueError(f"Nested placeholder in {{{field}:{format_spec}}} is not allowed")
+    
+    # Catch format specs and conversions that only fail when applied
+    try:
+        prompt_text.format(**{name: "" for name in allowed})
+    except (KeyError, IndexError, ValueError) as e:
+        raise ValueError(f"Could not format {prompt_type} prompt: {e}")
+
+
+def format_prompt(prompt_type: str, template: Optional[str] = None, **kwargs) -> str:
+    """Get and format a prompt with provided variables.
+    
+    Pass `template` to format an unsaved prompt text instead of the stored one;
+    a template that cannot be formatted raises ValueError rather than being
+    sent to the model as-is.
+    """
+    prompt = template if template is not None else get_prompt(prompt_type)
     try:
         return prompt.format(**kwargs)
-    except KeyError as e:
+    except (KeyError, IndexError, ValueError) as e:
+        if template is not None:
+            raise ValueError(f"Could not format {prompt_type} prompt: {e}")
         print(f"Missing variable in prompt: {e}")
         return prompt